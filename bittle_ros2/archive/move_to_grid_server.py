@@ -4,8 +4,14 @@ from rclpy.action import ActionServer
 from bittle_msgs.action import MoveToGrid
 from bittle_msgs.msg import Detection, Command
 from rclpy.callback_groups import ReentrantCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
+import collections
+import math
 import numpy as np
 
+# degrees <-> radians factor computed once at import instead of per tick
+_DEG_PER_RAD = 180.0 / math.pi
+
 class MoveToGridServer(Node):
     def __init__(self):
         super().__init__('move_to_grid_server')
@@ -41,12 +47,20 @@ class MoveToGridServer(Node):
         self.crawl_threshold = 10
         self.turn_threshold = 40
 
-        self.grid_centers = {
-            "A1": (80, 60), "A2": (240, 60), "A3": (400, 60), "A4": (560, 60),
-            "B1": (80, 180), "B2": (240, 180), "B3": (400, 180), "B4": (560, 180),
-            "C1": (80, 300), "C2": (240, 300), "C3": (400, 300), "C4": (560, 300),
-            "D1": (80, 420), "D2": (240, 420), "D3": (400, 420), "D4": (560, 420)
-        }
+        # Grid centers stored structure-of-arrays style: a name -> row-id map
+        # built once, plus one contiguous float32 array of center coordinates
+        # indexed by that id, so target lookups are a single array row read.
+        grid_names = [
+            "A1", "A2", "A3", "A4",
+            "B1", "B2", "B3", "B4",
+            "C1", "C2", "C3", "C4",
+            "D1", "D2", "D3", "D4"
+        ]
+        self._square_ids = {name: i for i, name in enumerate(grid_names)}
+        self._centers = np.array(
+            [(80 + 160 * col, 60 + 120 * row) for row in range(4) for col in range(4)],
+            dtype=np.float32
+        )
 
     def execute_callback(self, goal_handle):
         self.get_logger().info('Executing goal...')
@@ -54,7 +68,7 @@ class MoveToGridServer(Node):
         self.get_logger().info(f'Target square: {self.target_square}')
 
         feedback_msg = MoveToGrid.Feedback()
-        if self.target_square not in self.grid_centers:
+        if self.target_square not in self._square_ids:
             self.get_logger().error(f'Target square {self.target_square} not found in grid centers.')
             goal_handle.abort()
             return MoveToGrid.Result()
@@ -96,30 +110,25 @@ class MoveToGridServer(Node):
 
         self.previous_robot_position = robot_position
 
-        target_position = self.grid_centers[self.target_square]
-        direction_vector = (target_position[0] - robot_position[0], robot_position[1] - target_position[1])
+        target_position = self._centers[self._square_ids[self.target_square]]
+        direction_vector = np.array(
+            [target_position[0] - robot_position[0], robot_position[1] - target_position[1]],
+            dtype=np.float32
+        )
         self.get_logger().info(f'Direction vector: {direction_vector}')
         self.move_towards_target(direction_vector)
 
     def move_towards_target(self, direction_vector):
-        dx, dy = direction_vector
+        dx, dy = float(direction_vector[0]), float(direction_vector[1])
         self.get_logger().info(f'dx: {dx}, dy: {dy}')
-        epsilon = 1e-6
-        error = np.sqrt(dx**2 + dy**2) + epsilon
+        error = math.hypot(dx, dy)
         self.get_logger().info(f'Error: {error}')
-        Txhat = dx / error
-        Tyhat = dy / error
-        Rxhat = np.cos(self.current_heading * np.pi / 180)
-        Ryhat = np.sin(self.current_heading * np.pi / 180)
-        TdotR = Txhat * Rxhat + Tyhat * Ryhat
-        TcrossR = Txhat * Ryhat - Tyhat * Rxhat
-        magnitude_T = np.sqrt(Txhat**2 + Tyhat**2)
-        magnitude_R = np.sqrt(Rxhat**2 + Ryhat**2)
-        self.get_logger().info(f'TdotR: {TdotR}, magnitude_T: {magnitude_T}, magnitude_R: {magnitude_R}')
-        self.get_logger().info(f'Txhat: {Txhat}, Tyhat: {Tyhat}, Rxhat: {Rxhat}, Ryhat: {Ryhat}')
-        theta = np.arccos(np.clip(TdotR, -1.0, 1.0)) * 180 / np.pi
-        if TcrossR < 0:
-            theta = -theta
+        # Signed angle between the target direction and the current heading,
+        # wrapped to [-180, 180]. atan2 keeps the sign, so there is no need
+        # for the unit vectors, dot/cross products or arccos used before,
+        # and the wrap is plain modular arithmetic rather than sin/cos.
+        theta = math.atan2(dy, dx) * _DEG_PER_RAD - self.current_heading
+        theta = (theta + 180.0) % 360.0 - 180.0
         self.get_logger().info(f'Theta: {theta}')
         self.get_logger().info(f'Current heading: {self.current_heading}')
         if error < 20:
@@ -156,12 +165,14 @@ class MoveToGridServer(Node):
     def detection_callback(self, msg):
         self.current_heading = msg.april_tag_orientation
         self.current_position = msg.april_tag_location
-        centers = list(zip(*(iter(msg.center),) * 2))
-        detections = []
+        # one reshape to (N, 2) rows instead of the pairwise iterator trick
+        centers = np.asarray(msg.center, dtype=np.float32).reshape(-1, 2)
+        # bounded container so a burst of detections can never grow without
+        # limit; built locally and swapped in so readers see a whole frame
+        detections = collections.deque(maxlen=32)
 
         for class_name, grid_square, center in zip(msg.class_names, msg.grid_squares, centers):
-            center_x, center_y = center[0], center[1]
-            detections.append((class_name, grid_square, (center_x, center_y)))
+            detections.append((class_name, grid_square, (float(center[0]), float(center[1]))))
 
         self.detections = detections
         
@@ -170,8 +181,15 @@ class MoveToGridServer(Node):
 def main(args=None):
     rclpy.init(args=args)
     move_to_grid_server = MoveToGridServer()
-    rclpy.spin(move_to_grid_server)
-    rclpy.shutdown()
+    # spin on a multi-threaded executor so the ReentrantCallbackGroup can
+    # actually run detection_callback and execute_callback concurrently
+    executor = MultiThreadedExecutor(num_threads=3)
+    executor.add_node(move_to_grid_server)
+    try:
+        executor.spin()
+    finally:
+        executor.shutdown()
+        rclpy.shutdown()
 
 if __name__ == '__main__':
     main()
@@ -2,16 +2,23 @@
 
 import rclpy
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, ReliabilityPolicy, HistoryPolicy
+from rclpy.duration import Duration
 import serial
 import struct
-import sys
+import threading
 import time
-import math
-from std_msgs.msg import String
-from geometry_msgs.msg import Twist
 from bittle_msgs.msg import Detection
+import numpy as np
 
-dir_dict = {1: 'kcrF', -1: 'kbk', 2: 'kcrL', 3: 'kcrR', 0: 'kbalance', 4: 'kpone', 5: 'kptwo', 6: 'kpthree', 7: 'kpfour', 8: 'kcollectF', 9: 'kturn'}
+# struct.Struct objects cached per payload length so pack() doesn't have to
+# re-parse a freshly built format string for every command
+_PACKERS = {n: struct.Struct('b' * n) for n in range(1, 17)}
+
+# command strings indexed directly by direction id (0-9); the trailing
+# 'kbk' slot makes dir = -1 resolve via negative indexing
+DIR_CMDS = ('kbalance', 'kcrF', 'kcrL', 'kcrR', 'kpone', 'kptwo', 'kpthree',
+            'kpfour', 'kcollectF', 'kturn', 'kbk')
 
 
 class Driver(Node):
@@ -26,7 +33,11 @@ class Driver(Node):
             Detection,
             '/detection_topic',
             self.callback,
-            1)
+            QoSProfile(
+                depth=1,
+                history=HistoryPolicy.KEEP_LAST,
+                reliability=ReliabilityPolicy.BEST_EFFORT
+            ))
         self.subscription  # prevent unused variable warning
         self.ser = serial.Serial(
             port=port,
@@ -48,76 +59,103 @@ class Driver(Node):
         self.black_pheromones_dropped = 0
         self.white_pheromones_dropped = 0
 
-    def callback(self, msg): # for processing the detection messages
-        self.get_logger().info("Received a /detection_topic message!")
+        # per-token encoders resolved once here, so each serial write is a
+        # dict dispatch to a preselected encoder instead of re-walking an
+        # if/elif chain over the token for every command
+        self._num_encoders = {
+            'l': self._encode_packed, 'i': self._encode_packed,
+            'c': self._encode_ascii_pair, 'm': self._encode_ascii_pair,
+            'u': self._encode_ascii_pair, 'b': self._encode_ascii_pair,
+        }
+        self._byte_encoders = {
+            'c': self._encode_words, 'm': self._encode_words,
+            'b': self._encode_words, 'u': self._encode_words,
+            'l': self._encode_split_packed, 'i': self._encode_split_packed,
+            'w': self._encode_line, 'k': self._encode_line,
+        }
+
+        # latest-only buffer: the subscription just stores the newest message
+        # and a timer processes it at <= 10 Hz, so the decision rate is
+        # decoupled from however fast detections arrive
+        self._latest_lock = threading.Lock()
+        self._latest_msg = None
+        self._busy_until = self.get_clock().now()
+        self.decision_timer = self.create_timer(0.1, self._on_tick)
 
-        results = list(msg.results) # returns a list with numeric labels for the objects 0: acorn 1: black pheromone 2: white pheromone
-        xywhn_list = list(msg.xywhn_list) #returns a list with the x, y, width, height, of each detection, ordered by the from the top of the frame to the bottom
-        # make lists to store detection info
-        self.acorn_list = []
-        self.black_pheromone_list = []
-        self.white_pheromone_list = []
-        for i in range(len(results)): # for each detection, append the xywhn_list to the appropriate list
-            if results[i] == 0:
-                self.acorn_list.append(xywhn_list[(i*4):(4*(i+1))])
-            elif results[i] == 1:
-                self.black_pheromone_list.append(xywhn_list[(i*4):(4*(i+1))])
-            elif results[i] == 2:
-                self.white_pheromone_list.append(xywhn_list[(i*4):(4*(i+1))])
+    def callback(self, msg): # store the newest detection message
+        with self._latest_lock:
+            self._latest_msg = msg
 
+    def _on_tick(self): # for processing the detection messages
+        # still executing the previous command; let its delay elapse without
+        # blocking the executor in time.sleep
+        if self.get_clock().now() < self._busy_until:
+            return
+        with self._latest_lock:
+            msg = self._latest_msg
+            self._latest_msg = None
+        if msg is None:
+            return
+        self.get_logger().debug("Received a /detection_topic message!")
 
-        print("Acorn List: ", self.acorn_list)
-        print("Black Pheromone List: ", self.black_pheromone_list)
-        print("White Pheromone List: ", self.white_pheromone_list)
+        # numeric labels for the objects 0: acorn 1: black pheromone 2: white pheromone
+        res = np.asarray(msg.results, dtype=np.int8)
+        # x, y, width, height of each detection, one row per detection,
+        # ordered from the top of the frame to the bottom
+        xy = np.asarray(msg.xywhn_list, dtype=np.float32).reshape(-1, 4)
+        # bucket detections per class with a mask instead of a Python loop
+        self.acorn_arr = xy[res == 0]
+        self.black_pheromone_arr = xy[res == 1]
+        self.white_pheromone_arr = xy[res == 2]
 
         self.command_logic()
 
     def command_logic(self):     
         current_time = time.time()
         time_since_last_command = current_time - self.last_command_time
-        if len(self.acorn_list) > 0:
+        if len(self.acorn_arr) > 0:
             if self.found_acorn == False:
                 self.found_acorn = True
                 self.searching = False
                 self.collecting = True
-                print("found acorn")
-            if self.acorn_list[-1][0] > 0.75:
-                print("turning right")
+                self.get_logger().debug("found acorn")
+            if self.acorn_arr[-1, 0] > 0.75:
+                self.get_logger().debug("turning right")
                 dir = 3
-            elif self.acorn_list[-1][0] < 0.25:
-                print("turning left")
+            elif self.acorn_arr[-1, 0] < 0.25:
+                self.get_logger().debug("turning left")
                 dir = 2
-            elif self.acorn_list[-1][1] > 0.85:
-                print("collecting acorn")
+            elif self.acorn_arr[-1, 1] > 0.85:
+                self.get_logger().debug("collecting acorn")
                 dir = 8
             else:
-                print("going straight")
+                self.get_logger().debug("going straight")
                 dir = 1
         elif self.searching:
-            if len(self.black_pheromone_list) > 0:
-                print("found black pheromone")
-                if self.black_pheromone_list[-1][0] > 0.75:
-                    print("turning right")
+            if len(self.black_pheromone_arr) > 0:
+                self.get_logger().debug("found black pheromone")
+                if self.black_pheromone_arr[-1, 0] > 0.75:
+                    self.get_logger().debug("turning right")
                     dir = 3
-                elif self.black_pheromone_list[-1][0] < 0.25:
-                    print("turning left")
+                elif self.black_pheromone_arr[-1, 0] < 0.25:
+                    self.get_logger().debug("turning left")
                     dir = 2
                 else:
-                    print("going straight")
+                    self.get_logger().debug("going straight")
                     dir = 1
-            elif len(self.white_pheromone_list) > 0 and len(self.black_pheromone_list) == 0:
-                print("found white pheromone")
-                if self.white_pheromone_list[-1][0] > 0.75:
-                    print("turning right")
+            elif len(self.white_pheromone_arr) > 0 and len(self.black_pheromone_arr) == 0:
+                self.get_logger().debug("found white pheromone")
+                if self.white_pheromone_arr[-1, 0] > 0.75:
+                    self.get_logger().debug("turning right")
                     dir = 3
-                elif self.white_pheromone_list[-1][0] < 0.25:
-                    print("turning left")
+                elif self.white_pheromone_arr[-1, 0] < 0.25:
+                    self.get_logger().debug("turning left")
                     dir = 2
                 else:
-                    print("going straight")
+                    self.get_logger().debug("going straight")
                     dir = 1
             else:
-                print("no detections")
+                self.get_logger().debug("no detections")
                 dir = 9
         else:
             dir = 0
@@ -135,7 +173,7 @@ class Driver(Node):
                     dir = 7
 
         if self.dir != dir:
-            self.wrapper([dir_dict[dir], 0])
+            self.wrapper([DIR_CMDS[dir], 0])
             self.dir = dir
             self.num_commands_sent += 1
             self.last_command_time = current_time
@@ -155,42 +193,59 @@ class Driver(Node):
 
 
     def wrapper(self, task):  # Structure is [token, var=[], time]
-        print(task)
         if len(task) == 2:
             self.serialWriteByte([task[0]])
         elif isinstance(task[1][0], int):
             self.serialWriteNumToByte(task[0], task[1])
         else:
             self.serialWriteByte(task[1])
-        time.sleep(task[-1])
+        self._busy_until = self.get_clock().now() + Duration(seconds=task[-1])
+
+    # Each encoder assembles the whole command into one buffer so only a
+    # single ser.write() (one syscall / UART burst) happens per command.
+
+    def _encode_packed(self, token, var):  # token + packed signed bytes + '~'
+        values = [int(x) for x in var]
+        packer = _PACKERS.get(len(values))
+        buf = bytearray()
+        buf.append(ord(token))
+        if packer is not None:
+            buf += packer.pack(*values)
+        else:
+            buf += struct.pack('b' * len(values), *values)
+        buf += b'~'
+        return bytes(buf)
+
+    def _encode_ascii_pair(self, token, var):  # token + two ascii fields
+        return (token + str(var[0]) + " " + str(var[1]) + '\n').encode()
+
+    def _encode_words(self, var):  # space-separated ascii words
+        buf = bytearray()
+        for element in var:
+            buf += element.encode()
+            buf += b' '
+        return bytes(buf)
+
+    def _encode_split_packed(self, var):  # leading word may carry the first value
+        token = var[0][0]
+        if (len(var[0]) > 1):
+            var.insert(1, var[0][1:])
+        return self._encode_packed(token, var[1:])
+
+    def _encode_line(self, var):  # whole command followed by newline
+        return var[0].encode() + b'\n'
 
     def serialWriteNumToByte(self, token, var=[]):  # Only to be used for c m u b i l o within Python
-        # print("Num Token "); print(token);print(" var ");print(var);print("\n\n");
-        if token == 'l' or token == 'i':
-            var = list(map(lambda x: int(x), var))
-            instrStr = token + struct.pack('b' * len(var), *var) + '~'
-        elif token == 'c' or token == 'm' or token == 'u' or token == 'b':
-            instrStr = token + str(var[0]) + " " + str(var[1]) + '\n'
-        print("!!!!" + instrStr)
-        self.ser.write(instrStr.encode())
+        self.ser.write(self._num_encoders[token](token, var))
 
     def serialWriteByte(self, var=[]):
         token = var[0][0]
-        if (token == 'c' or token == 'm' or token == 'b' or token == 'u') and len(var) >= 2:
-            instrStr = ""
-            for element in var:
-                instrStr = instrStr + element + " "
-        elif token == 'l' or token == 'i':
-            if (len(var[0]) > 1):
-                var.insert(1, var[0][1:])
-            var[1:] = list(map(lambda x: int(x), var[1:]))
-            instrStr = token + struct.pack('b' * len(var[1:]), *var[1:]) + '~'
-        elif token == 'w' or token == 'k':
-            instrStr = var[0] + '\n'
+        encoder = self._byte_encoders.get(token)
+        if encoder is None or (encoder == self._encode_words and len(var) < 2):
+            payload = token.encode()
         else:
-            instrStr = token
-        print("!!!!!!! " + instrStr)
-        self.ser.write(instrStr.encode())
+            payload = encoder(var)
+        self.ser.write(payload)
 
 
 def main(args=None):
@@ -1,15 +1,46 @@
 import rclpy
 from rclpy.node import Node
-from rclpy.duration import Duration
-from std_msgs.msg import String
-from geometry_msgs.msg import Twist
+from rclpy.qos import QoSProfile, ReliabilityPolicy, HistoryPolicy
 from bittle_msgs.msg import Detection
 from bittle_msgs.msg import Command, CommandList, State
-import time
+import collections
+from dataclasses import dataclass
+import threading
+import numpy as np
+
+# command strings bound to module-level names once at import, instead of a
+# dict hashed on every lookup in the decision path
+FORWARD = 'kcrF'
+BACK = 'kbk'
+LEFT = 'kcrL'
+RIGHT = 'kcrR'
+REST = 'krest'
+BLACK1 = 'kpone'
+BLACK2 = 'kptwo'
+WHITE1 = 'kpthree'
+WHITE2 = 'kpfour'
+COLLECT = 'kcollectF'
+SPIN_LEFT = 'kvtL'
+SPIN_RIGHT = 'kvtR'
+BUTT_UP = 'kbuttUp'
+
+@dataclass
+class RobotState:
+    """Mission state tracked across detection ticks; attribute access is a
+    slot read instead of a string-keyed dict lookup in the decision path."""
+    found_acorn: bool = False
+    found_black_pheromone: bool = False
+    found_white_pheromone: bool = False
+    searching: bool = True
+    collecting: bool = False
+    collected: bool = False
+    black_pheromones_dropped: int = 0
+    white_pheromones_dropped: int = 0
+    returning: bool = False
+    mission_complete: bool = False
+    last_command_sent: object = None
+    observing: bool = False
 
-cmd_dict = {'forward': 'kcrF', 'back': 'kbk', 'left': 'kcrL', 'right': 'kcrR', 'rest': 'krest', 'black1': 'kpone',
-             'black2': 'kptwo', 'white1': 'kpthree', 'white2': 'kpfour', 'collect': 'kcollectF', 'spinLeft': 'kvtL', 
-             'spinRight': 'kvtR', 'buttUp': 'kbuttUp'}
 
 class Driver(Node):
     def __init__(self):
@@ -18,7 +49,11 @@ class Driver(Node):
             Detection,
             '/detection_topic',
             self.detection_callback,
-            1)
+            QoSProfile(
+                depth=1,
+                history=HistoryPolicy.KEEP_LAST,
+                reliability=ReliabilityPolicy.BEST_EFFORT
+            ))
         
         # Create a publisher for the Command messages
         self.command_publisher = self.create_publisher(Command, 'serial_command_topic', 10)
@@ -27,76 +62,81 @@ class Driver(Node):
         # create a publisher for command buffer
         self.command_list_publisher = self.create_publisher(CommandList, 'command_list_topic', 10)
 
-        self.current_state = {
-            'found_acorn': False,
-            'found_black_pheromone': False,
-            'found_white_pheromone': False,
-            'searching': True,
-            'collecting': False,
-            'collected': False,
-            'black_pheromones_dropped': 0,
-            'white_pheromones_dropped': 0,
-            'returning': False,
-            'mission_complete': False,
-            'last_command_sent': None,
-            'observing': False
-        }
-
-        self.command_list = []
+        self.current_state = RobotState()
+        # set by update_state on a field transition; publish_state only
+        # marshals and publishes when this is set (True initially so the
+        # starting state goes out once)
+        self._state_dirty = True
+
+        # Bounded window of recent command pairs plus incremental counts,
+        # so choosing the most frequent command is O(1) per callback and
+        # memory stays constant no matter how fast detections arrive.
+        self.command_window = collections.deque(maxlen=5)
+        self.command_counts = collections.Counter()
+        # most recent (command, delay) pair per command name, so picking the
+        # pair for the winning command is a dict read, not a window scan
+        self._latest_pair = {}
         self.command_to_send = None
+        self._last_published = (None, None)
+
+        # latest-only buffer: the subscription just stores the newest message
+        # and a timer runs the decision pipeline at <= 10 Hz, so the decision
+        # rate is decoupled from however fast detections arrive
+        self._latest_lock = threading.Lock()
+        self._latest_msg = None
+        self.decision_timer = self.create_timer(0.1, self._on_tick)
 
     def detection_callback(self, msg):
+        with self._latest_lock:
+            self._latest_msg = msg
+
+    def _on_tick(self):
+        with self._latest_lock:
+            msg = self._latest_msg
+            self._latest_msg = None
+        if msg is None:
+            return
         self.process_detections(msg) # turning message into lists of detections (acorn, pheromones)
         self.current_state = self.update_state() # updating the state based on the detections
         command = self.decide_command(self.current_state) # what command to send based on the state and detections
-        self.command_list.append(command) # add the command to the list of possible commands to send
-        self.choose_command_to_send() # choose the most frequent command to send
+        # decide_command returns either one command pair or a sequence of them
+        pairs = command if isinstance(command[0], (list, tuple)) else [command]
+        for pair in pairs:
+            self.add_command(tuple(pair)) # add to the window of possible commands to send
         self.publish_command()
         self.publish_state()
         self.publish_command_list()
 
+    def add_command(self, command_pair):
+        if len(self.command_window) == self.command_window.maxlen:
+            evicted = self.command_window[0][0]
+            self.command_counts[evicted] -= 1
+            if self.command_counts[evicted] == 0:
+                del self.command_counts[evicted]
+                self._latest_pair.pop(evicted, None)
+        self.command_window.append(command_pair)
+        self.command_counts[command_pair[0]] += 1
+        self._latest_pair[command_pair[0]] = command_pair
+
     def publish_command_list(self):
-        print("command list: ", self.command_list)
         msg = CommandList()
         list_of_commands = []
-        for command_pair in self.command_list:
+        for command_pair in self.command_window:
             list_of_commands.append(command_pair[0])
         msg.command_list = list_of_commands
-        self.get_logger().info(f"Publishing command list: {msg.command_list}")
+        self.get_logger().debug(f"Publishing command list: {msg.command_list}")
         self.command_list_publisher.publish(msg)
 
     def choose_command_to_send(self):
-        if not self.command_list:
-            return
-        # 
-
+        if not self.command_counts:
+            return None
+        return self.command_counts.most_common(1)[0][0]
 
     def publish_command(self):
-        if not self.command_list:
+        if not self.command_window:
             return
-        # Create empty dictionary to store command frequencies
-        command_frequency = {}
-        # command buffer is list of list of lists, make list of lists
-        print("command list before reducing: ", self.command_list)
-        for command_pair in self.command_list:
-            command = command_pair[0]
-            if command in command_frequency:
-                command_frequency[command] += 1
-            else:
-                command_frequency[command] = 1
-        most_frequent_command = max(command_frequency, key=command_frequency.get)
-
-        for command_pair in self.command_list:
-            if command_pair[0] == most_frequent_command:
-                command_to_send = command_pair
-                break
-        
-        # Clear the command buffer after selecting the most frequent command, if it is too long
-        if len(self.command_list) > 5:
-            self.command_list.clear()
-        print("command to send: ", command_to_send)
-        
-        self.process_command_sequence(command_to_send)
+        most_frequent_command = self.choose_command_to_send()
+        self.process_command_sequence(self._latest_pair[most_frequent_command])
 
 
         
@@ -105,92 +145,99 @@ class Driver(Node):
             return  # No more commands to process
 
         # Extract the first command and its delay
-        print("command pair: ", command_pair)
         command, delay = command_pair
 
+        # Skip republishing when the decision hasn't changed; a stable
+        # detection would otherwise resend the same command every tick
+        if (command, delay) == self._last_published:
+            return
+        self._last_published = (command, delay)
+
         # Send the command
-        print(f"Sending command: {command}, with delay: {delay}")
         msg = Command()
         msg.cmd = command
         msg.delay = delay
-        self.get_logger().info(f"Publishing command: {msg.cmd}, with delay: {msg.delay}")
+        self.get_logger().debug(f"Publishing command: {msg.cmd}, with delay: {msg.delay}")
         self.command_publisher.publish(msg)
 
 
  
 
     def publish_state(self):
+        if not self._state_dirty:
+            return
+        self._state_dirty = False
         msg = State()
-        msg.found_acorn = self.current_state['found_acorn']
-        msg.found_black_pheromone = self.current_state['found_black_pheromone']
-        msg.found_white_pheromone = self.current_state['found_white_pheromone']
-        msg.searching = self.current_state['searching']
-        msg.collecting = self.current_state['collecting']
-        msg.collected = self.current_state['collected']
-        msg.black_pheromones_dropped = self.current_state['black_pheromones_dropped']
-        msg.white_pheromones_dropped = self.current_state['white_pheromones_dropped']
-        msg.returning = self.current_state['returning']
-        msg.mission_complete = self.current_state['mission_complete']
-        if self.current_state['last_command_sent'] is not None:
-            last_command = self.current_state['last_command_sent']
+        msg.found_acorn = self.current_state.found_acorn
+        msg.found_black_pheromone = self.current_state.found_black_pheromone
+        msg.found_white_pheromone = self.current_state.found_white_pheromone
+        msg.searching = self.current_state.searching
+        msg.collecting = self.current_state.collecting
+        msg.collected = self.current_state.collected
+        msg.black_pheromones_dropped = self.current_state.black_pheromones_dropped
+        msg.white_pheromones_dropped = self.current_state.white_pheromones_dropped
+        msg.returning = self.current_state.returning
+        msg.mission_complete = self.current_state.mission_complete
+        if self.current_state.last_command_sent is not None:
+            last_command = self.current_state.last_command_sent
             msg.last_command_sent = str(last_command) 
         else:
             msg.last_command_sent = 'None'
-        self.get_logger().info(f"Publishing state: {msg}")
+        self.get_logger().debug(f"Publishing state: {msg}")
         self.state_publisher.publish(msg)  
         
 
     def update_state(self):
                 # if we are searching and find an acorn, we are no longer searching
-        if self.current_state['searching'] == True and len(self.acorn_list) > 0:
-            self.current_state['searching'] = False
-            self.current_state['found_acorn'] = True
-        elif not self.current_state['found_black_pheromone'] and len(self.black_pheromone_list) > 0:
-            self.current_state['found_black_pheromone'] = True
-        elif not self.current_state['found_white_pheromone'] and len(self.white_pheromone_list) > 0:
-            self.current_state['found_white_pheromone'] = True
-        elif len(self.acorn_list) > 0 and self.acorn_list[-1][1] > 0.9:
-            print("acorn position: ", self.acorn_list[-1][1])
-            self.current_state['collecting'] = True
-        
+        if self.current_state.searching == True and len(self.acorn_arr) > 0:
+            self.current_state.searching = False
+            self.current_state.found_acorn = True
+            self._state_dirty = True
+        elif not self.current_state.found_black_pheromone and len(self.black_pheromone_arr) > 0:
+            self.current_state.found_black_pheromone = True
+            self._state_dirty = True
+        elif not self.current_state.found_white_pheromone and len(self.white_pheromone_arr) > 0:
+            self.current_state.found_white_pheromone = True
+            self._state_dirty = True
+        elif len(self.acorn_arr) > 0 and self.acorn_arr[-1, 1] > 0.9 and not self.current_state.collecting:
+            self.get_logger().debug(f"acorn position: {self.acorn_arr[-1, 1]}")
+            self.current_state.collecting = True
+            self._state_dirty = True
+
         return self.current_state
 
 
     def process_detections(self, detection_msg):
         # Analyze detection messages and update state
-        self.get_logger().info("Received a /detection_topic message!")
-
-        results = list(detection_msg.results) # returns a list with numeric labels for the objects 0: acorn 1: black pheromone 2: white pheromone
-        xywhn_list = list(detection_msg.xywhn_list) #returns a list with the x, y, width, height, of each detection, ordered by the from the top of the frame to the bottom
-        # make lists to store detection info
-        self.acorn_list = []
-        self.black_pheromone_list = []
-        self.white_pheromone_list = []
-        for i in range(len(results)): # for each detection, append the xywhn_list to the appropriate list
-            if results[i] == 0:
-                self.acorn_list.append(xywhn_list[(i*4):(4*(i+1))])
-            elif results[i] == 1:
-                self.black_pheromone_list.append(xywhn_list[(i*4):(4*(i+1))])
-            elif results[i] == 2:
-                self.white_pheromone_list.append(xywhn_list[(i*4):(4*(i+1))])    
+        self.get_logger().debug("Received a /detection_topic message!")
+
+        # numeric labels for the objects 0: acorn 1: black pheromone 2: white pheromone
+        res = np.asarray(detection_msg.results, dtype=np.int8)
+        # x, y, width, height of each detection, one row per detection,
+        # ordered from the top of the frame to the bottom
+        xy = np.asarray(detection_msg.xywhn_list, dtype=np.float32).reshape(-1, 4)
+        # bucket detections per class with a mask instead of a Python loop
+        self.acorn_arr = xy[res == 0]
+        self.black_pheromone_arr = xy[res == 1]
+        self.white_pheromone_arr = xy[res == 2]
 
 
     def decide_command(self, state):
         # if we found an acorn, that's all we need care about
-        if state['found_acorn'] and not state['collecting']: 
-            cmd = self.follow_object(self.acorn_list)
+        if state.found_acorn and not state.collecting: 
+            cmd = self.follow_object(self.acorn_arr)
         # if we haven't found an acorn, but we have found black pheromones, follow them
-        elif not state['found_acorn'] and state['found_black_pheromone']:
-            cmd = self.follow_object(self.black_pheromone_list)
+        elif not state.found_acorn and state.found_black_pheromone:
+            cmd = self.follow_object(self.black_pheromone_arr)
         # if we haven't found an acorn or black pheromones, but we have found white pheromones, follow them
-        elif (not state['found_acorn'] and not state['found_black_pheromone'] and state['found_white_pheromone']):
-            cmd = self.follow_object(self.white_pheromone_list)
-        elif state['collecting']:
-            cmd = self.collect_acorn(self.acorn_list)
+        elif (not state.found_acorn and not state.found_black_pheromone and state.found_white_pheromone):
+            cmd = self.follow_object(self.white_pheromone_arr)
+        elif state.collecting:
+            cmd = self.collect_acorn(self.acorn_arr)
 
         # if we haven't found anything, stop and wait for a detection
         else:
-            cmd = [cmd_dict['rest'], 0]
+            cmd = [REST, 0]
 
         #print("decide command: ", cmd)
 
@@ -199,14 +246,14 @@ class Driver(Node):
     def follow_object(self, detection_list):
         commands = []
         if len(detection_list) > 0:
-            if detection_list[-1][0] > 0.7:
-                cmd = cmd_dict['right']
-            elif detection_list[-1][0] < 0.3:
-                cmd = cmd_dict['left']
+            if detection_list[-1, 0] > 0.7:
+                cmd = RIGHT
+            elif detection_list[-1, 0] < 0.3:
+                cmd = LEFT
             else:
-                cmd = cmd_dict['forward']
+                cmd = FORWARD
         else:
-            cmd = cmd_dict['rest']
+            cmd = REST
         commands.append([cmd, 0])
         #print("follow object commands: ", commands)
         return commands
@@ -214,41 +261,42 @@ class Driver(Node):
     def collect_acorn(self, detection_list):
        initial_detection_count = len(detection_list)
        commands = []
-       while not self.current_state['collected']:
+       while not self.current_state.collected:
         #if not detection_list:
-            #cmd = cmd_dict['rest']
+            #cmd = REST
             #print("No detection found. Exiting...")
             #break
         
-        x_position, y_position = detection_list[-1][:2]
+        x_position, y_position = detection_list[-1, :2]
         
         # Adjust the robot's x position by spinning.
         if x_position > 0.7:
-            commands.append([cmd_dict['spinRight'], .25])
-            commands.append([cmd_dict['buttUp'], 0])
+            commands.append([SPIN_RIGHT, .25])
+            commands.append([BUTT_UP, 0])
         elif x_position < 0.3:
-            commands.append([cmd_dict['spinLeft'], .25])
-            commands.append([cmd_dict['buttUp'], 0])
+            commands.append([SPIN_LEFT, .25])
+            commands.append([BUTT_UP, 0])
         
         # Adjust the robot's y position by moving backward or forward.
         if y_position < 0.5:
-            commands.append([cmd_dict['forward'], .5])
-            commands.append([cmd_dict['buttUp'], 0])
+            commands.append([FORWARD, .5])
+            commands.append([BUTT_UP, 0])
         elif y_position > 0.8:
-            commands.append([cmd_dict['back'], .5])
-            commands.append([cmd_dict['buttUp'], 0])
+            commands.append([BACK, .5])
+            commands.append([BUTT_UP, 0])
         
         # If the x and y positions are within acceptable ranges, attempt to collect the acorn.
         if 0.3 <= x_position <= 0.7 and 0.5 <= y_position <= 0.8:
-            commands.append([cmd_dict['collect'], 1])
-            commands.append([cmd_dict['buttUp'], 0])
+            commands.append([COLLECT, 1])
+            commands.append([BUTT_UP, 0])
             # Check if the acorn was successfully collected.
             if len(detection_list) < initial_detection_count:
-                self.current_state['collected'] = True
+                self.current_state.collected = True
+                self._state_dirty = True
                 break
             else:
                 # If the acorn was not collected, reassess the position and try again.
-                commands.append([cmd_dict['buttUp'], 0])
+                commands.append([BUTT_UP, 0])
                 initial_detection_count = len(detection_list)
         #print("collect acorn commands: ", commands)
 
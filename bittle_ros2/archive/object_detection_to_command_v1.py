@@ -1,7 +1,6 @@
 import rclpy
 from rclpy.node import Node
-from std_msgs.msg import String
-from geometry_msgs.msg import Twist
+from rclpy.qos import QoSProfile, ReliabilityPolicy, HistoryPolicy
 from bittle_msgs.msg import Detection
 from bittle_msgs.msg import Command 
 from bittle_msgs.msg import State
@@ -18,7 +17,11 @@ class Driver(Node):
             Detection,
             '/detection_topic',
             self.detection_callback,
-            1)
+            QoSProfile(
+                depth=1,
+                history=HistoryPolicy.KEEP_LAST,
+                reliability=ReliabilityPolicy.BEST_EFFORT
+            ))
         # Create a publisher for the Command messages
         self.command_publisher = self.create_publisher(Command, 'serial_command_topic', 10)
         self.state_publisher = self.create_publisher(State, 'state_topic', 10)
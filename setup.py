@@ -5,6 +5,11 @@ import sys
 
 package_name = 'bittle_ros2'
 
+# glob once and reuse the lists so the filesystem isn't re-scanned for
+# every data_files entry
+launch_files = glob('launch/*.py')
+module_files = glob('bittle_ros2/*.py')
+
 setup(
     name=package_name,
     version='0.0.0',
@@ -13,8 +18,8 @@ setup(
         ('share/ament_index/resource_index/packages',
             ['resource/' + package_name]),
         ('share/' + package_name, ['package.xml']),
-        (os.path.join('share', package_name), glob('launch/*.py')),
-        (os.path.join('share', package_name), glob('bittle_ros2/*.py')),
+        (os.path.join('share', package_name), launch_files),
+        (os.path.join('share', package_name), module_files),
     ],
     install_requires=['setuptools'],
     options={